@@ -1,57 +1,74 @@
-import xml.etree.ElementTree as ET
+from lxml import etree
 import pandas as pd
+import io
 import re
 
 
-def load_alteryx_nodes(file_path):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    rows = []
+def _node_tool_type(node):
+    gui_settings = node.find("GuiSettings")
+    tool_type = gui_settings.attrib.get("Plugin") if gui_settings is not None else None
+    if tool_type:
+        # Extract the last component from the dotted string.
+        clear_name = tool_type.split('.')[-1]
+        # Remove trailing parentheses if present.
+        if clear_name.endswith("()"):
+            clear_name = clear_name[:-2]
+        # Convert to title case for clarity.
+        tool_type = clear_name.title()
+    return tool_type
 
-    def inner_xml(element):
-        # Join the XML string of all child elements.
-        return ''.join(ET.tostring(child, encoding='unicode') for child in element)
-
-    def traverse(node):
-        if node.tag == 'Node':
-            tool_id = node.attrib.get("ToolID")
-            if tool_id:
-                gui_settings = node.find("GuiSettings")
-                tool_type = gui_settings.attrib.get("Plugin") if gui_settings is not None else None
-                if tool_type:
-                    # Extract the last component from the dotted string.
-                    clear_name = tool_type.split('.')[-1]
-                    # Remove trailing parentheses if present.
-                    if clear_name.endswith("()"):
-                        clear_name = clear_name[:-2]
-                    # Convert to title case for clarity.
-                    tool_type = clear_name.title()
-                text = inner_xml(node)
-                rows.append([tool_id, tool_type, text])
-        # Recursively traverse child nodes.
-        for child in node:
-            traverse(child)
-
-    traverse(root)
-    df_nodes = pd.DataFrame(rows, columns=["tool_id", "tool_type", "text"])
 
+def _inner_xml(element):
+    # Join the XML string of all child elements.
+    return ''.join(etree.tostring(child, encoding='unicode') for child in element)
 
-    return df_nodes
 
+def _is_workflow_connection(element):
+    # Only <Connection> elements directly under the document's top-level <Connections> describe the workflow.
+    parent = element.getparent()
+    return (parent is not None and parent.tag == "Connections"
+            and parent.getparent() is not None and parent.getparent().getparent() is None)
+
+
+def _free(element):
+    # Drop an element that has been processed, and its already processed previous siblings.
+    element.clear()
+    while element.getprevious() is not None:
+        del element.getparent()[0]
 
-def load_alteryx_connections(file_path):
-    # Parse the XML file
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    connections = []
 
-    # Locate the <Connections> element in the XML file.
-    connections_element = root.find("Connections")
-    if connections_element is not None:
-        # Iterate over each <Connection> element
-        for connection in connections_element.findall("Connection"):
-            origin = connection.find("Origin")
-            destination = connection.find("Destination")
+def _parse_workflow(file_path):
+    """
+    Stream through the workflow XML with lxml's iterparse and collect the node rows and connections.
+    Top-level nodes and connections are freed as soon as they are processed, so the whole document is
+    never held in memory. Nodes inside a container are kept until the container ends, as the container's
+    text must include them.
+    """
+    rows = []
+    connections = []
+    open_rows = []  # Row index (or None) of every <Node> that is started but not finished, outermost first.
+
+    for event, elem in etree.iterparse(file_path, events=("start", "end"), tag=("Node", "Connection"),
+                                       remove_comments=True, remove_pis=True):
+        if elem.tag == "Node":
+            if event == "start":
+                # Reserve the row on the start tag, so containers come before their children as in the document.
+                if elem.attrib.get("ToolID"):
+                    rows.append(None)
+                    open_rows.append(len(rows) - 1)
+                else:
+                    open_rows.append(None)
+                continue
+
+            row_index = open_rows.pop()
+            if row_index is not None:
+                rows[row_index] = [elem.attrib.get("ToolID"), _node_tool_type(elem), _inner_xml(elem)]
+            if not open_rows:
+                _free(elem)
+
+        elif event == "end" and _is_workflow_connection(elem):
+            origin = elem.find("Origin")
+            destination = elem.find("Destination")
             if origin is not None and destination is not None:
                 connections.append({
                     "origin_tool_id": origin.attrib.get("ToolID"),
@@ -59,17 +76,44 @@ def load_alteryx_connections(file_path):
                     "destination_tool_id": destination.attrib.get("ToolID"),
                     "destination_connection": destination.attrib.get("Connection")
                 })
+            _free(elem)
 
+    return rows, connections
+
+
+def _nodes_frame(rows):
+    df_nodes = pd.DataFrame(rows, columns=["tool_id", "tool_type", "text"])
+    # Only a few distinct tool types exist, so a categorical makes filtering on tool_type
+    # an integer code comparison. Tool ids use the dedicated string dtype instead of object.
+    df_nodes["tool_id"] = df_nodes["tool_id"].astype("string")
+    df_nodes["tool_type"] = df_nodes["tool_type"].astype("category")
+
+    return df_nodes
+
+
+def load_alteryx_nodes(file_path):
+    rows, _ = _parse_workflow(file_path)
+    return _nodes_frame(rows)
+
+
+def load_alteryx_connections(file_path):
+    _, connections = _parse_workflow(file_path)
     # Create a DataFrame from the list of connections.
     return pd.DataFrame(connections)
 
 
 def load_alteryx_data(file_path):
+    """
+    Load the nodes and connections DataFrames of a workflow.
+    `file_path` can be a path or a binary file-like object (e.g. io.BytesIO).
+    """
     try:
-        df_nodes = load_alteryx_nodes(file_path)
-        df_connections = load_alteryx_connections(file_path)
+        # Stream through the XML once and build both DataFrames from it.
+        rows, connections = _parse_workflow(file_path)
+        df_nodes = _nodes_frame(rows)
+        df_connections = pd.DataFrame(connections)
         return df_nodes, df_connections
-    except ET.ParseError as e:
+    except etree.XMLSyntaxError as e:
         print(f"Error parsing XML file: {e}")
         return pd.DataFrame(), pd.DataFrame()  # Return empty DataFrames on error
     except Exception as e:
@@ -77,6 +121,14 @@ def load_alteryx_data(file_path):
         return pd.DataFrame(), pd.DataFrame()  # Return empty DataFrames on error
 
 
+def load_alteryx_data_from_bytes(file_bytes):
+    """
+    Same as load_alteryx_data, but reads the workflow from its raw bytes (e.g. a Streamlit upload)
+    instead of a file path.
+    """
+    return load_alteryx_data(io.BytesIO(file_bytes))
+
+
 def extract_container_children(df_nodes):
     """
     For each container row in df_nodes (where tool_type is 'ToolContainer'),
@@ -126,7 +178,7 @@ def clean_container_children(df_containers, df_nodes):
             if not matching.empty:
                 # Check the tool type (case-insensitive)
                 child_type = matching.iloc[0]["tool_type"]
-                if child_type not in {"Toolcontainer", "BrowseV2"}:
+                if child_type.lower() not in {"toolcontainer", "browsev2"}:
                     filtered_ids.append(cid)
             else:
                 # If the child tool isn't found, include it (or you can choose to exclude it)
@@ -3,12 +3,25 @@ import os
 import sys
 print(os.getcwd())
 
-from code.traverse_helper import get_input_name, get_output_name
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+
+from code.traverse_helper import get_input_name, get_output_name, index_connections
 import pandas as pd
 from langchain.chat_models import ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
+from langchain.prompts import ChatPromptTemplate, PromptTemplate
+from openai import OpenAI
+try:
+    # orjson is much faster for the (potentially large) Batch API JSONL payloads; fall back to json.
+    import orjson
+except ImportError:
+    orjson = None
 from code.ToolContextDictionary import comprehensive_guide
+from code.rule_helper import rule_based_codegen
 import streamlit as st
 
 
@@ -16,6 +29,7 @@ def create_tool_io_template(df_connections, tool_id):
     """
     For a given tool_id, create a template string describing its inputs and outputs.
     The template will use get_input_name and get_output_name to obtain the names.
+    df_connections can be a plain connections DataFrame or the result of index_connections.
 
     Example output:
     "This tool (tool id 583) has 2 input(s): df_580_Output connects to the 'Left', df_582_Output connects to the 'Right'.
@@ -57,119 +71,515 @@ def create_tool_io_template(df_connections, tool_id):
     return template_text
 
 
-def generate_python_code_from_alteryx_df(df_nodes, df_connections, progress_bar=None, message_placeholder=None):
+# System message shared by every tool prompt. It holds no tool specific data, so the prompt prefix is
+# identical across all calls. At ~130 tokens it is below OpenAI's 1024 token prompt caching minimum,
+# so this is only a message structure split, it does not by itself reduce input cost or latency.
+SYSTEM_PROMPT = """
+    You are an expert data engineer. You convert Alteryx tool configurations into equivalent Python code using open-source libraries.
+    In the <DefaultAnnotationText> element, there is a text field that contains the high level description of the tool but it could be empty. You can keep it as comment in the code.
+    
+    Rules:
+    1. Please return only the Python code that reproduces the functionality of this tool.
+    2. Include import statements as a comments.
+    3. Don't include any function definitions or docstrings.
+    4. Don't include sample data, just the code.
+    """
+
+# User message template with the details of a single Alteryx tool.
+TOOL_CODE_TEMPLATE = """
+    Convert the following Alteryx tool configuration into equivalent Python code.
+    Tool type: {tool_type}
+    Configuration details: {config_text}
+    I/O details: {io_info}
+    Additional instructions: {additional_instructions}
+    """
+
+# User message template for several tools in one request; {tool_sections} holds one TOOL_SECTION_TEMPLATE per tool.
+MULTI_TOOL_TEMPLATE = """
+    Convert each of the following Alteryx tool configurations into equivalent Python code.
+    Every tool is given between a "### TOOL <tool id>" line and a "### END" line.
+    Answer with one block per tool: a line "### CODE <tool id>" followed by the code of that tool only.
+
+    {tool_sections}
+    """
+
+TOOL_SECTION_TEMPLATE = """### TOOL {tool_id}
+Tool type: {tool_type}
+Configuration details: {config_text}
+I/O details: {io_info}
+Additional instructions: {additional_instructions}
+### END
+"""
+
+# Header line that starts the code of one tool in a multi-tool response.
+CODE_BLOCK_HEADER = re.compile(r"^\s*#{2,3}\s*CODE\s+(\S+?)\s*$", re.MULTILINE)
+
+# Maximum number of tool prompts sent to OpenAI at the same time (keeps us under the RPM limit).
+MAX_CONCURRENT_REQUESTS = 8
+
+
+# Number of streamed chunks between two refreshes of a tool's code placeholder.
+STREAM_UPDATE_EVERY = 20
+
+
+def _tool_prompt_template():
+    # The fixed system message comes first, the per-tool details only in the user message.
+    return ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        ("human", TOOL_CODE_TEMPLATE)
+    ])
+
+
+def _tool_messages(prompt_inputs):
+    # Same messages as _tool_prompt_template, in the OpenAI API format.
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": TOOL_CODE_TEMPLATE.format(**prompt_inputs)}
+    ]
+
+
+def _tool_prompt_inputs(row, df_connections):
+    """
+    Build the prompt variables (tool type, config, I/O details and tool guide) for a single tool row.
+    """
+    tool_name = row["tool_type"]
+    # Inject additional instructions if available in the dictionary.
+    additional_instructions = (
+        f'Refer to this additional information for "{tool_name}" tool - {comprehensive_guide[tool_name]}'
+        if tool_name in comprehensive_guide else ""
+    )
+    # Create the I/O description using the helper function.
+    io_info = create_tool_io_template(df_connections, row["tool_id"])
+
+    return {
+        "tool_type": row["tool_type"],
+        "config_text": row["text"],
+        "io_info": io_info,
+        "additional_instructions": additional_instructions
+    }
+
+
+def _tool_cache_key(prompt_inputs, model):
+    """
+    Stable hash of everything that goes into a tool's prompt, used to memoize the generated code.
+    """
+    key_source = repr((model, sorted(prompt_inputs.items())))
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+
+class ProgressThrottle:
+    """
+    Wrap a Streamlit progress bar and message placeholder and forward at most one update per
+    `min_interval` seconds. Every update is a message to the browser, and with concurrent tools
+    finishing close together most of them would be redrawn right away anyway.
+    """
+
+    def __init__(self, progress_bar=None, message_placeholder=None, min_interval=0.1):
+        self.progress_bar = progress_bar
+        self.message_placeholder = message_placeholder
+        self.min_interval = min_interval
+        self._last_update = 0.0
+
+    def update(self, value, message=None, force=False):
+        # The final update (force=True) is always shown.
+        now = time.monotonic()
+        if not force and now - self._last_update < self.min_interval:
+            return
+        self._last_update = now
+        if self.progress_bar is not None:
+            self.progress_bar.progress(min(max(value, 0.0), 1.0))  # Clamp the value between 0.0 and 1.0
+        if self.message_placeholder is not None and message is not None:
+            self.message_placeholder.write(message)
+
+
+def _update_progress(progress, done_tools, total_tools):
+    progress.update(
+        0.05 + (done_tools / total_tools) * 0.8,
+        f"**Generating code, {total_tools - done_tools} tool(s) remaining...**",
+        force=done_tools == total_tools
+    )
+
+
+async def agenerate_python_code_from_alteryx_df(df_nodes, df_connections, progress_bar=None, message_placeholder=None,
+                                                max_concurrency=MAX_CONCURRENT_REQUESTS, cache=None, model="gpt-4o",
+                                                code_container=None):
     """
     Convert Alteryx tool configurations in a DataFrame to equivalent Python code,
     incorporating I/O details so the LLM knows which dataframes are expected.
 
+    All tools are sent to the LLM concurrently (at most `max_concurrency` at a time),
+    so the total time is roughly the time of the slowest tool instead of the sum of all tools.
+    If a `cache` dict is given, tools whose prompt did not change since a previous run reuse
+    the cached code instead of calling the LLM again.
+    The responses are streamed; with a `code_container`, each tool's code is shown while it is generated.
+    Simple tools (see rule_helper.RULE_BASED_TOOL_TYPES) are converted by rules without calling the LLM.
+
     Parameters:
         df_nodes (pd.DataFrame): DataFrame containing columns 'tool_id', 'tool_type', and 'text'.
         progress_bar (st.progress): Optional Streamlit progress bar to update during processing.
+        max_concurrency (int): Maximum number of simultaneous LLM requests.
+        cache (dict): Optional mapping of prompt hash -> generated code, updated in place.
+        model (str): The OpenAI chat model used for code generation.
+        code_container: Optional Streamlit container (e.g. st.expander) to render the code of each tool into.
 
     Returns:
-        pd.DataFrame: A DataFrame with columns 'tool_id', 'tool_type', and 'python_code'.
-    """
-    # Define a prompt template with an additional_instructions placeholder.
-    template = """
-    You are an expert data engineer. Convert the following Alteryx tool configuration into equivalent Python code using open-source libraries.
-    Tool type: {tool_type}
-    Configuration details: {config_text}
-    I/O details: {io_info}
-    Additional instructions: {additional_instructions} In the <DefaultAnnotationText> element, there is a text field that contains the high level description of the tool but it could be empty. You can keep it as comment in the code.
-    
-    Rules:
-    1. Please return only the Python code that reproduces the functionality of this tool.
-    2. Include import statements as a comments.
-    3. Don't include any function definitions or docstrings.
-    4. Don't include sample data, just the code.
+        pd.DataFrame: A DataFrame with columns 'tool_id', 'tool_type', 'python_code' and
+                      'source' ("rule" or "llm").
     """
-
-    prompt_template = PromptTemplate(
-        input_variables=["tool_type", "config_text", "io_info", "additional_instructions"],
-        template=template
-    )
+    prompt_template = _tool_prompt_template()
 
     # Initialize the ChatOpenAI LLM using your chosen model.
-    llm = ChatOpenAI(temperature=0, model_name="gpt-4o")
+    llm = ChatOpenAI(temperature=0, model_name=model)
 
-    # Create the LangChain LLMChain.
-    chain = LLMChain(llm=llm, prompt=prompt_template)
+    # Pipe the prompt into the LLM so the response can be streamed chunk by chunk.
+    chain = prompt_template | llm
 
-    results = []
-    total_tools = len(df_nodes)  # Total number of tools to process
-    rest_tools = total_tools
-    progress_value = 0.05  # Initial progress value
-    # Process each node in the DataFrame.
-    for index, row in df_nodes.iterrows():
-        tool_name = row["tool_type"]
-        # Inject additional instructions if available in the dictionary.
-        additional_instructions = (
-            f'Refer to this additional information for "{tool_name}" tool - {comprehensive_guide[tool_name]}'
-            if tool_name in comprehensive_guide else ""
-        )
-        # Create the I/O description using the helper function.
-        io_info = create_tool_io_template(df_connections, row["tool_id"])
+    # Index the connections once so the per-tool I/O lookups don't scan all connections.
+    connections = index_connections(df_connections)
 
-        generated_code = chain.run(
-            tool_type=row["tool_type"],
-            config_text=row["text"],
-            io_info=io_info,
-            additional_instructions=additional_instructions
-        ).strip()
+    total_tools = len(df_nodes)  # Total number of tools to process
+    semaphore = asyncio.Semaphore(max_concurrency)
+    progress_lock = asyncio.Lock()
+    progress = ProgressThrottle(progress_bar, message_placeholder)
+    done_tools = 0
+    cache_hits = 0
+    rule_tools = 0
+
+    async def generate_one(row, code_placeholder):
+        nonlocal done_tools, cache_hits, rule_tools
+        # Simple tools have a deterministic equivalent and don't need the LLM at all.
+        generated_code = rule_based_codegen(row, connections)
+        source = "rule"
+
+        if generated_code is not None:
+            rule_tools += 1
+        else:
+            source = "llm"
+            prompt_inputs = _tool_prompt_inputs(row, connections)
+            cache_key = _tool_cache_key(prompt_inputs, model)
 
-        results.append({
+            if cache is not None and cache_key in cache:
+                generated_code = cache[cache_key]
+                cache_hits += 1
+            else:
+                async with semaphore:
+                    chunks = []
+                    async for chunk in chain.astream(prompt_inputs):
+                        chunks.append(chunk.content or "")
+                        # Refresh the placeholder every few chunks instead of on every token.
+                        if code_placeholder is not None and len(chunks) % STREAM_UPDATE_EVERY == 0:
+                            code_placeholder.code("".join(chunks), language="python")
+                generated_code = "".join(chunks).strip()
+                if cache is not None:
+                    cache[cache_key] = generated_code
+
+        if code_placeholder is not None:
+            code_placeholder.code(generated_code, language="python")
+
+        async with progress_lock:
+            done_tools += 1
+            _update_progress(progress, done_tools, total_tools)
+
+        return {
             "tool_id": row["tool_id"],
             "tool_type": row["tool_type"],
-            "python_code": generated_code
-        })
+            "python_code": generated_code,
+            "source": source
+        }
 
-        
-        # Update progress bar
-        if progress_bar is not None:
-            progress_value += (1 / total_tools)*0.8
-            progress_bar.progress(min(max(progress_value, 0.0), 1.0))  # Clamp the value between 0.0 and 1.0
+    # One placeholder per tool, created up front so the tools are shown in row order.
+    rows = [row for _, row in df_nodes.iterrows()]
+    code_placeholders = [code_container.empty() if code_container is not None else None for _ in rows]
 
-        rest_tools -= 1
-        # Update message_placeholder
-        message_placeholder.write(
-            f"**Generating code for {rest_tools} tool(s), it may take {rest_tools * 4} seconds...**")
+    # Process every node in the DataFrame concurrently; gather keeps the original row order.
+    results = await asyncio.gather(*(generate_one(row, ph) for row, ph in zip(rows, code_placeholders)))
+    logging.debug("Rule based tools: %d, tool code cache: %d hit(s), %d miss(es).",
+                  rule_tools, cache_hits, total_tools - rule_tools - cache_hits)
 
-    return pd.DataFrame(results)
+    return pd.DataFrame(results, columns=["tool_id", "tool_type", "python_code", "source"])
 
 
-def combine_python_code_of_tools(tool_ids, df_generated_code, execution_sequence="",extra_user_instructions="", model="gpt-4o"):
+def generate_python_code_from_alteryx_df(df_nodes, df_connections, progress_bar=None, message_placeholder=None):
     """
-    Combine the Python code for multiple tool IDs into a single script using an LLM.
+    Synchronous wrapper around agenerate_python_code_from_alteryx_df for callers without an event loop.
+    """
+    return asyncio.run(
+        agenerate_python_code_from_alteryx_df(df_nodes, df_connections, progress_bar, message_placeholder)
+    )
+
+
+def _parse_code_blocks(response_text):
+    """
+    Split a multi-tool response into {tool_id: code} using its "### CODE <tool id>" header lines.
+    """
+    # re.split with a capture group gives [text before the first header, id, code, id, code, ...].
+    parts = CODE_BLOCK_HEADER.split(response_text)
+    code_blocks = {}
+    for tool_id, code in zip(parts[1::2], parts[2::2]):
+        code = code.strip()
+        # Drop a markdown code fence if the model added one anyway.
+        code = re.sub(r"^```(?:python)?\s*\n|\n?```$", "", code).strip()
+        code_blocks[tool_id] = code
+    return code_blocks
+
+
+async def agenerate_python_code_batched(df_nodes, df_connections, batch_size=5, progress_bar=None,
+                                        message_placeholder=None, max_concurrency=MAX_CONCURRENT_REQUESTS,
+                                        cache=None, model="gpt-4o"):
+    """
+    Same as agenerate_python_code_from_alteryx_df, but sends the tools in groups of `batch_size`,
+    each group as a single LLM request asking for one labeled code block per tool.
+    This saves round-trips and shares the system prompt, which helps when the requests-per-minute
+    limit is the bottleneck. The groups themselves run concurrently.
+    Simple tools are converted by rules and never included in a group.
 
     Parameters:
-        tool_ids (list): A list of tool IDs (str or int) you want to combine.
-        df_generated_code (pd.DataFrame): DataFrame containing columns:
-                                          'tool_id' and 'python_code'.
-                                          Each row holds Python code for a particular tool.
-        extra_user_instructions (str): Additional instructions for the code generation.
+        df_nodes (pd.DataFrame): DataFrame containing columns 'tool_id', 'tool_type', and 'text'.
+        batch_size (int): Number of tools per LLM request.
+        progress_bar (st.progress): Optional Streamlit progress bar to update during processing.
+        max_concurrency (int): Maximum number of simultaneous LLM requests.
+        cache (dict): Optional mapping of prompt hash -> generated code, updated in place.
+        model (str): The OpenAI chat model used for code generation.
+
     Returns:
-        str: A single string with the merged Python code.
+        pd.DataFrame: A DataFrame with columns 'tool_id', 'tool_type', 'python_code' and
+                      'source' ("rule" or "llm").
     """
-
-    # 1) Gather the code snippets for each tool in the specified order.
-    #    We'll just concatenate them in the prompt for the LLM.
-    code_snippets = []
-    for tool_id in tool_ids:
-        # Filter for the row matching this tool_id
-        subset = df_generated_code.loc[df_generated_code["tool_id"] == tool_id, "python_code"]
-        if not subset.empty:
-            code_snippets.append(subset.iloc[0])
+    prompt_template = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        ("human", MULTI_TOOL_TEMPLATE)
+    ])
+    llm = ChatOpenAI(temperature=0, model_name=model)
+    chain = prompt_template | llm
+
+    connections = index_connections(df_connections)
+
+    rows = [row for _, row in df_nodes.iterrows()]
+    total_tools = len(rows)
+    generated_code = {}  # tool_id -> code
+    sources = {}  # tool_id -> "rule" or "llm"
+    cache_keys = {}  # tool_id -> cache key
+    pending = []  # (row, prompt_inputs) of the tools that need the LLM
+
+    for row in rows:
+        rule_code = rule_based_codegen(row, connections)
+        sources[row["tool_id"]] = "rule" if rule_code is not None else "llm"
+        if rule_code is not None:
+            generated_code[row["tool_id"]] = rule_code
+            continue
+        prompt_inputs = _tool_prompt_inputs(row, connections)
+        cache_key = _tool_cache_key(prompt_inputs, model)
+        cache_keys[row["tool_id"]] = cache_key
+        if cache is not None and cache_key in cache:
+            generated_code[row["tool_id"]] = cache[cache_key]
         else:
-            code_snippets.append(f"# No code found for tool {tool_id}")
+            pending.append((row, prompt_inputs))
+    logging.debug("Tool code without LLM call (rules or cache): %d, LLM requests needed: %d.",
+                  total_tools - len(pending), len(pending))
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    progress_lock = asyncio.Lock()
+    progress = ProgressThrottle(progress_bar, message_placeholder)
+    done_tools = total_tools - len(pending)
+
+    async def generate_group(group):
+        nonlocal done_tools
+        tool_sections = "\n".join(
+            TOOL_SECTION_TEMPLATE.format(tool_id=row["tool_id"], **prompt_inputs) for row, prompt_inputs in group
+        )
+        async with semaphore:
+            response = await chain.ainvoke({"tool_sections": tool_sections})
+        code_blocks = _parse_code_blocks(response.content)
+
+        for row, _ in group:
+            tool_id = row["tool_id"]
+            if tool_id in code_blocks:
+                generated_code[tool_id] = code_blocks[tool_id]
+                if cache is not None:
+                    cache[cache_keys[tool_id]] = code_blocks[tool_id]
+            else:
+                logging.warning("No code block returned for tool %s.", tool_id)
+                generated_code[tool_id] = f"# No code generated for tool {tool_id}"
 
-    # Create a single string with all code snippets.
-    all_tool_code = "\n\n".join(
-        f"Tool {tool_id} code:\n{snippet}" for tool_id, snippet in zip(tool_ids, code_snippets)
+        async with progress_lock:
+            done_tools += len(group)
+            _update_progress(progress, done_tools, total_tools)
+
+    groups = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    await asyncio.gather(*(generate_group(group) for group in groups))
+
+    results = [{
+        "tool_id": row["tool_id"],
+        "tool_type": row["tool_type"],
+        "python_code": generated_code[row["tool_id"]],
+        "source": sources[row["tool_id"]]
+    } for row in rows]
+
+    return pd.DataFrame(results, columns=["tool_id", "tool_type", "python_code", "source"])
+
+
+def _jsonl_line(obj):
+    # Encode one JSONL line (bytes, newline included), with orjson when it's installed.
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY)
+    return (json.dumps(obj) + "\n").encode("utf-8")
+
+
+def _json_loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+# Batch statuses after which OpenAI will not produce any (more) output.
+BATCH_FAILED_STATUSES = {"failed", "expired", "cancelling", "cancelled"}
+
+
+def submit_batch(df_nodes, df_connections, model="gpt-4o"):
+    """
+    Submit the code generation of every tool in df_nodes as a single OpenAI Batch API job.
+    Batch jobs cost about half of the regular API and are not bound by the per-minute rate limits,
+    but they can take minutes (up to 24h) to complete. Tools handled by rule_based_codegen are not submitted.
+
+    Parameters:
+        df_nodes (pd.DataFrame): DataFrame containing columns 'tool_id', 'tool_type', and 'text'.
+        model (str): The OpenAI chat model used for every request.
+
+    Returns:
+        str: The id of the created batch, to be passed to retrieve_batch_results,
+             or None if every tool is handled by rules and there was nothing to submit.
+    """
+    connections = index_connections(df_connections)
+
+    # 1) Build one JSONL line per tool; the tool id is used as custom_id to map the responses back.
+    lines = []
+    for _, row in df_nodes.iterrows():
+        if rule_based_codegen(row, connections) is not None:
+            continue
+        request = {
+            "custom_id": str(row["tool_id"]),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "temperature": 0,
+                "messages": _tool_messages(_tool_prompt_inputs(row, connections))
+            }
+        }
+        lines.append(_jsonl_line(request))
+    if not lines:
+        return None
+
+    # 2) Upload the requests and 3) start the batch job.
+    client = OpenAI()
+    batch_file = client.files.create(
+        file=("tool_prompts.jsonl", b"".join(lines)),
+        purpose="batch"
     )
-    if not extra_user_instructions:
-        extra_user_instructions = ''
-    # 2) Create a prompt template that instructs the LLM to merge the code snippets.
-    template = """
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch.id
+
+
+def retrieve_batch_results(batch_id, df_nodes, df_connections, progress_bar=None, message_placeholder=None,
+                           poll_interval=10):
+    """
+    Wait for a batch created by submit_batch to finish and collect the generated code.
+
+    Parameters:
+        batch_id (str): The id returned by submit_batch (None if nothing was submitted).
+        df_nodes (pd.DataFrame): The same DataFrame that was passed to submit_batch.
+        df_connections (pd.DataFrame): The same connections that were passed to submit_batch.
+        progress_bar (st.progress): Optional Streamlit progress bar to update while polling.
+        poll_interval (int): Seconds to wait between two status checks.
+
+    Returns:
+        pd.DataFrame: A DataFrame with columns 'tool_id', 'tool_type', 'python_code' and
+                      'source' ("rule" or "llm").
+    """
+    generated_code = {}
+    if batch_id is not None:
+        generated_code = _wait_for_batch_output(batch_id, progress_bar, message_placeholder, poll_interval)
+
+    connections = index_connections(df_connections)
+    results = []
+    for _, row in df_nodes.iterrows():
+        # The rule based tools were not submitted, generate them again (it's deterministic and cheap).
+        rule_code = rule_based_codegen(row, connections)
+        if rule_code is not None:
+            python_code, source = rule_code, "rule"
+        else:
+            python_code = generated_code.get(str(row["tool_id"]), f"# No code generated for tool {row['tool_id']}")
+            source = "llm"
+        results.append({
+            "tool_id": row["tool_id"],
+            "tool_type": row["tool_type"],
+            "python_code": python_code,
+            "source": source
+        })
+
+    return pd.DataFrame(results, columns=["tool_id", "tool_type", "python_code", "source"])
+
+
+def _wait_for_batch_output(batch_id, progress_bar=None, message_placeholder=None, poll_interval=10):
+    """
+    Poll a batch until it completes and return its output as {custom_id: generated code}.
+    """
+    client = OpenAI()
+
+    # 4) Poll until the batch is done.
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status == "completed":
+            break
+        if batch.status in BATCH_FAILED_STATUSES:
+            raise Exception(f"Batch {batch_id} ended with status '{batch.status}'.")
+
+        counts = batch.request_counts
+        if counts is not None and counts.total:
+            if progress_bar is not None:
+                progress_value = 0.05 + (counts.completed / counts.total) * 0.8
+                progress_bar.progress(min(max(progress_value, 0.0), 1.0))  # Clamp the value between 0.0 and 1.0
+            if message_placeholder is not None:
+                message_placeholder.write(
+                    f"**Batch {batch.status}: {counts.completed} of {counts.total} tool(s) done...**")
+        elif message_placeholder is not None:
+            message_placeholder.write(f"**Batch {batch.status}, waiting for OpenAI to start it...**")
+        time.sleep(poll_interval)
+
+    # 5) Download the output and map custom_id -> generated code. Failed requests are in the
+    #    error file (and non 200 responses can also be in the output file).
+    generated_code = {}
+    failed_requests = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).content.splitlines():
+            if not line.strip():
+                continue
+            record = _json_loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") == 200:
+                message = response["body"]["choices"][0]["message"]
+                generated_code[record["custom_id"]] = (message.get("content") or "").strip()
+            else:
+                error = record.get("error") or (response.get("body") or {}).get("error") or {}
+                failed_requests[record["custom_id"]] = error.get("message") or f"status {response.get('status_code')}"
+
+    for custom_id, error_message in failed_requests.items():
+        logging.warning("Batch request for tool %s failed: %s", custom_id, error_message)
+    if not generated_code:
+        failed_count = batch.request_counts.failed if batch.request_counts is not None else len(failed_requests)
+        raise Exception(f"Batch {batch_id} completed without any successful request ({failed_count} failed).")
+
+    return generated_code
+
+
+# Prompt that merges the snippets of all converted tools into a single script.
+COMBINE_CODE_PROMPT = PromptTemplate(
+    input_variables=["all_tool_code", "extra_user_instructions", "execution_sequence"],
+    template="""
     You are an expert data engineer. We have multiple python code snippets translated from different Alteryx tools, and we want to combine them into a single coherent Python script.
     
     Code snippets:
@@ -189,24 +599,45 @@ def combine_python_code_of_tools(tool_ids, df_generated_code, execution_sequence
 
     Provide only the merged code below:
     """
+)
 
-    prompt = PromptTemplate(
-        input_variables=["all_tool_code", "extra_user_instructions", "execution_sequence"],
-        template=template
-    )
 
-    # 3) Initialize the LLM and chain. Adjust your model or temperature as needed.
-    #    For example, using a hypothetical "gpt-4o-mini" model from your environment:
-    llm = ChatOpenAI(temperature=0, model_name=model)
-    chain = LLMChain(llm=llm, prompt=prompt)
+def combine_python_code_of_tools(code_map, execution_sequence, extra_user_instructions="", model="gpt-4o"):
+    """
+    Combine the Python code for multiple tool IDs into a single script using an LLM.
+
+    Parameters:
+        code_map (dict): Mapping of tool ID (str) -> generated Python code of that tool.
+        execution_sequence (list): The tool IDs to combine, in execution order.
+        extra_user_instructions (str): Additional instructions for the code generation.
+    Returns:
+        str: A single string with the merged Python code.
+    """
 
-    # 4) Run the chain to combine the code.
-    merged_code = chain.run(all_tool_code=all_tool_code, execution_sequence=execution_sequence, extra_user_instructions=extra_user_instructions).strip()
+    # 1) Gather the code snippets for each tool in execution order.
+    #    We'll just concatenate them in the prompt for the LLM.
+    tool_ids = list(execution_sequence)
+    code_snippets = [code_map.get(str(tool_id), f"# No code found for tool {tool_id}") for tool_id in tool_ids]
 
-    full_prompt = prompt.format(
+    # Create a single string with all code snippets.
+    all_tool_code = "\n\n".join(
+        f"Tool {tool_id} code:\n{snippet}" for tool_id, snippet in zip(tool_ids, code_snippets)
+    )
+    if not extra_user_instructions:
+        extra_user_instructions = ''
+    # 2) Fill the prompt that instructs the LLM to merge the code snippets. It is formatted only once,
+    #    the same text is sent to the LLM and returned to be shown to the user.
+    full_prompt = COMBINE_CODE_PROMPT.format(
         all_tool_code=all_tool_code,
         extra_user_instructions=extra_user_instructions,
         execution_sequence=execution_sequence
     )
 
+    # 3) Initialize the LLM. Adjust your model or temperature as needed.
+    #    For example, using a hypothetical "gpt-4o-mini" model from your environment:
+    llm = ChatOpenAI(temperature=0, model_name=model)
+
+    # 4) Run the LLM to combine the code.
+    merged_code = llm.invoke(full_prompt).content.strip()
+
     return merged_code, full_prompt
@@ -0,0 +1,141 @@
+import xml.etree.ElementTree as ET
+
+from code.traverse_helper import get_input_name, get_output_name
+
+
+def _configuration(row):
+    # The node text is the XML of the node's children, wrap it to get a single parsable element.
+    node = ET.fromstring(f"<Node>{row['text']}</Node>")
+    return node.find("Properties/Configuration"), node.findtext("Properties/Annotation/DefaultAnnotationText")
+
+
+def _single_io(df_connections, tool_id):
+    """
+    Return (input_name, output_name) for a tool with exactly one input, or None otherwise.
+    """
+    input_details = get_input_name(df_connections, tool_id)
+    if len(input_details) != 1:
+        return None
+    output_names = get_output_name(df_connections, tool_id)
+    output_name = output_names[0] if output_names else f"df_{tool_id}_Output"
+    return input_details[0][0], output_name
+
+
+def _select_code(configuration, input_name, output_name):
+    # Reordering and type changes are left to the LLM.
+    order_changed = configuration.find("OrderChanged")
+    if order_changed is not None and order_changed.attrib.get("value") == "True":
+        return None
+
+    keep_unknown = True
+    selected, deselected, renames = [], [], {}
+    for select_field in configuration.findall("SelectFields/SelectField"):
+        field = select_field.attrib.get("field")
+        is_selected = select_field.attrib.get("selected") == "True"
+        if field == "*Unknown":
+            keep_unknown = is_selected
+            continue
+        if "type" in select_field.attrib or "input" in select_field.attrib:
+            return None
+        if is_selected:
+            selected.append(field)
+            if select_field.attrib.get("rename"):
+                renames[field] = select_field.attrib["rename"]
+        else:
+            deselected.append(field)
+
+    # Alteryx keeps the entries of fields that no longer exist upstream (it only warns), so skip missing columns.
+    if keep_unknown:
+        lines = [f"{output_name} = {input_name}.drop(columns={deselected!r}, errors=\"ignore\")"]
+    else:
+        lines = [f"{output_name} = {input_name}[[c for c in {selected!r} if c in {input_name}.columns]]"]
+    if renames:
+        lines.append(f"{output_name} = {output_name}.rename(columns={renames!r})")
+    return "\n".join(lines)
+
+
+def _record_id_code(configuration, input_name, output_name):
+    field_name = configuration.findtext("FieldName") or "RecordID"
+    start_value = int(configuration.findtext("StartValue") or 1)
+    field_type = configuration.findtext("FieldType") or "Int32"
+    position = configuration.findtext("Position") or "0"
+
+    values = f"range({start_value}, {start_value} + len({output_name}))"
+    if field_type == "String":
+        # String record ids are zero padded to the field size.
+        field_size = int(configuration.findtext("FieldSize") or 1)
+        values = f"[str(i).zfill({field_size}) for i in {values}]"
+
+    lines = [f"{output_name} = {input_name}.copy()"]
+    if position == "0":
+        lines.append(f"{output_name}.insert(0, {field_name!r}, {values})")
+    else:
+        lines.append(f"{output_name}[{field_name!r}] = {values}")
+    return "\n".join(lines)
+
+
+def _sort_code(configuration, input_name, output_name):
+    sort_info = configuration.find("SortInfo")
+    # Dictionary order (a locale) sorts differently from pandas, leave it to the LLM.
+    if sort_info is None or sort_info.attrib.get("locale", "0") != "0":
+        return None
+    fields = sort_info.findall("Field")
+    if not fields:
+        return None
+    sort_fields = [field.attrib.get("field") for field in fields]
+    sort_order = [field.attrib.get("order") != "Descending" for field in fields]
+    # Alteryx sorts nulls as the smallest value (first when ascending, last when descending).
+    # pandas has a single na_position for all keys, so mixed directions are left to the LLM.
+    if len(set(sort_order)) != 1:
+        return None
+    na_position = "first" if sort_order[0] else "last"
+    return (f"{output_name} = {input_name}.sort_values(by={sort_fields!r}, ascending={sort_order[0]!r}, "
+            f"na_position=\"{na_position}\", kind=\"stable\").reset_index(drop=True)")
+
+
+# Tool types that have a deterministic pandas equivalent, mapped to their code emitter.
+RULE_BASED_TOOL_TYPES = {
+    "Alteryxselect": _select_code,
+    "Recordid": _record_id_code,
+    "Sort": _sort_code,
+}
+
+
+def rule_based_codegen(row, df_connections):
+    """
+    Generate the Python code of simple tools (Select, Record ID, Sort) without calling the LLM.
+
+    Parameters:
+        row (pd.Series): A row of df_nodes with 'tool_id', 'tool_type' and 'text'.
+        df_connections: The connections DataFrame (or the result of index_connections).
+
+    Returns:
+        str or None: The generated code, or None if the tool's configuration needs the LLM.
+    """
+    emitter = RULE_BASED_TOOL_TYPES.get(row["tool_type"])
+    if emitter is None:
+        return None
+
+    io_names = _single_io(df_connections, row["tool_id"])
+    if io_names is None:
+        return None
+
+    try:
+        configuration, annotation = _configuration(row)
+    except ET.ParseError:
+        return None
+    if configuration is None:
+        return None
+
+    try:
+        code = emitter(configuration, *io_names)
+    except ValueError:
+        # e.g. a non numeric StartValue or FieldSize.
+        return None
+    if code is None:
+        return None
+
+    header = f"# Tool {row['tool_id']} ({row['tool_type']})"
+    if annotation and annotation.strip():
+        header += f": {' '.join(annotation.split())}"
+    return f"{header}\n{code}"
@@ -1,8 +1,39 @@
-from collections import defaultdict
-import pandas as pd
+from collections import defaultdict, namedtuple
 import networkx as nx
 
 
+# Two copies of df_connections, indexed on the origin and on the destination tool id,
+# so per-tool lookups are index lookups instead of a boolean mask over all connections.
+IndexedConnections = namedtuple("IndexedConnections", ["by_origin", "by_destination"])
+
+CONNECTION_COLUMNS = ["origin_tool_id", "origin_connection", "destination_tool_id", "destination_connection"]
+
+
+def index_connections(df_connections):
+    """
+    Build an IndexedConnections from a connections DataFrame. It can be passed to
+    get_next_tools, get_previous_tools, get_output_name and get_input_name instead of df_connections.
+    """
+    if "origin_tool_id" not in df_connections.columns:
+        # Workflow without connections: the DataFrame has no columns at all, add them so
+        # the lookups below find no connection instead of raising a KeyError.
+        df_connections = df_connections.reindex(columns=CONNECTION_COLUMNS)
+    # A stable sort keeps the original order of the connections of each tool.
+    by_origin = df_connections.set_index("origin_tool_id", drop=False).sort_index(kind="stable")
+    by_destination = df_connections.set_index("destination_tool_id", drop=False).sort_index(kind="stable")
+    return IndexedConnections(by_origin, by_destination)
+
+
+def _connections_where(df_connections, column, tool_id):
+    # Return the connections whose `column` ('origin_tool_id' or 'destination_tool_id') equals tool_id.
+    if isinstance(df_connections, IndexedConnections):
+        indexed = df_connections.by_origin if column == "origin_tool_id" else df_connections.by_destination
+        if tool_id not in indexed.index:
+            return indexed.iloc[0:0]
+        return indexed.loc[[tool_id]]
+    return df_connections[df_connections[column] == tool_id]
+
+
 def get_execution_order(df_nodes, df_connections):
     """
     Returns a list of tool_ids in execution order based on the connections.
@@ -16,11 +47,9 @@ def get_execution_order(df_nodes, df_connections):
         G.add_node(tool_id)
 
     # Add edges: each edge from an origin tool to a destination tool
-    for _, row in df_connections.iterrows():
-        origin = row["origin_tool_id"]
-        destination = row["destination_tool_id"]
-        if pd.notnull(origin) and pd.notnull(destination):
-            G.add_edge(origin, destination)
+    if not df_connections.empty:
+        edges = df_connections[["origin_tool_id", "destination_tool_id"]].dropna()
+        G.add_edges_from(zip(edges["origin_tool_id"], edges["destination_tool_id"]))
 
     try:
         # Get a topological sort of the graph, which reflects the execution order
@@ -128,21 +157,21 @@ def get_tools_without_input(df_connections):
 
 def get_next_tools(df_connections, tool_id):
     # Filter the rows where the given tool_id is the origin
-    next_tools = df_connections[df_connections["origin_tool_id"] == tool_id]["destination_tool_id"].unique().tolist()
+    next_tools = _connections_where(df_connections, "origin_tool_id", tool_id)["destination_tool_id"].unique().tolist()
     next_tools_count = len(next_tools)
     return next_tools
 
 
 def get_previous_tools(df_connections, tool_id):
     # Filter the rows where the given tool_id is the destination
-    previous_tools = df_connections[df_connections["destination_tool_id"] == tool_id]["origin_tool_id"].unique().tolist()
+    previous_tools = _connections_where(df_connections, "destination_tool_id", tool_id)["origin_tool_id"].unique().tolist()
     previous_tools_count = len(previous_tools)
     return previous_tools, previous_tools_count
 
 
 def get_output_name(df_connections, tool_id):
     # Filter rows where the given tool_id is the origin
-    filtered = df_connections[df_connections["origin_tool_id"] == tool_id]
+    filtered = _connections_where(df_connections, "origin_tool_id", tool_id)
 
     if filtered.empty:
         return []
@@ -157,7 +186,7 @@ def get_output_name(df_connections, tool_id):
 
 def get_input_name(df_connections, tool_id):
     # Filter rows where the given tool_id is the destination
-    filtered = df_connections[df_connections["destination_tool_id"] == tool_id]
+    filtered = _connections_where(df_connections, "destination_tool_id", tool_id)
 
     results = []
     for _, row in filtered.iterrows():
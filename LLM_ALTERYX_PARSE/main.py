@@ -11,7 +11,7 @@ Features:
   - Input a comma-separated list of tool IDs you want to convert.
   - Run conversion to generate Python code.
   - Display the final Python script.
-  - Debug logging to trace execution.
+  - Debug logging (set LOG_LEVEL=DEBUG) to trace execution.
 
 Usage:
     streamlit run main.py
@@ -19,13 +19,15 @@ Usage:
 
 import os
 import sys
+import asyncio
 import streamlit as st
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-# Configure debug logging
+# Configure logging; set LOG_LEVEL=DEBUG to trace execution.
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
     format="%(asctime)s [%(levelname)s] %(message)s",
     handlers=[logging.StreamHandler(sys.stdout)]
 )
@@ -37,7 +39,7 @@ def set_project_root(marker: str = "README.md"):
     Once found, set that directory as the working directory and add it to sys.path.
     """
     current_dir = Path().resolve()
-    logging.debug(f"Starting search for project root from: {current_dir}")
+    logging.debug("Starting search for project root from: %s", current_dir)
     for parent in [current_dir, *current_dir.parents]:
         if (parent / marker).exists():
             os.chdir(parent)
@@ -64,17 +66,97 @@ except Exception as e:
     logging.exception("Error importing project modules.")
     st.stop()
 
+# Translation table deleting quotes and brackets from the pasted tool IDs in a single pass.
+_CLEAN_TBL = str.maketrans("", "", "\"'[]")
+
+# Tool types that are not converted to Python code. These are the parsed names: the plugin
+# name is title-cased, so the BrowseV2 tool is "Browsev2".
+SKIPPED_TOOL_TYPES = {"Browsev2", "Toolcontainer"}
+
+# -- Cached helpers --
+# Streamlit reruns the whole script on every interaction, so expensive steps are cached.
+# The parsed workflow is keyed on the uploaded file's bytes, not on a (reused) temp file path.
+@st.cache_data(show_spinner=False)
+def _load_cached(file_bytes: bytes):
+    return parser.load_alteryx_data_from_bytes(file_bytes)
+
+
+@st.cache_data(show_spinner=False)
+def _load_container_children(file_bytes: bytes):
+    df_nodes, _ = _load_cached(file_bytes)
+    df_containers = parser.extract_container_children(df_nodes)
+    return parser.clean_container_children(df_containers, df_nodes)
+
+
+@st.cache_data(show_spinner=False)
+def _get_execution_order(df_nodes, df_connections):
+    return traverse_helper.get_execution_order(df_nodes, df_connections)
+
+
+@st.cache_resource
+def _executor():
+    # Shared by all sessions; runs the workflow parsing off the script thread.
+    return ThreadPoolExecutor(max_workers=4)
+
+
+def _load_workflow():
+    """
+    Return (df_nodes, df_connections) of the uploaded workflow. The parsing is started in the background
+    as soon as the file is uploaded; this only waits for it if it hasn't finished yet.
+    """
+    load_fut = st.session_state.load_fut
+    if not load_fut.done():
+        with st.spinner("Parsing workflow..."):
+            return load_fut.result()
+    return load_fut.result()
+
+
+async def _generate_code_while_ordering(generate_code, df_nodes, df_connections):
+    """
+    Await the tool code generation coroutine while the execution order is computed in a worker thread,
+    so the graph work overlaps with waiting on the LLM. Returns (df_generated_code, execution_sequence).
+    """
+    order_task = asyncio.create_task(asyncio.to_thread(_get_execution_order, df_nodes, df_connections))
+    df_generated_code = await generate_code
+    execution_sequence = await order_task
+    return df_generated_code, execution_sequence
+
+
 # --------------------- Sidebar ---------------------------
 # --------------------- Sidebar ---------------------------
 # --------------------- Sidebar ---------------------------
 st.sidebar.header("Step 1 - Upload Workflow File")
 # File uploader: user browses for a .yxmd file.
 uploaded_file = st.sidebar.file_uploader("Select Alteryx Workflow File", type=["yxmd", "yxmc"])
+# Keep the workflow in memory; it is parsed straight from these bytes, nothing is written to disk.
+file_bytes = uploaded_file.getvalue() if uploaded_file else None
+file_key = hash(file_bytes) if file_bytes is not None else None
+# Start parsing a newly uploaded file in the background; the buttons below pick up the result.
+if file_key is not None and st.session_state.get("load_key") != file_key:
+    st.session_state.load_fut = _executor().submit(_load_cached, file_bytes)
+    st.session_state.load_key = file_key
 st.sidebar.header("Step 2 - Upload OpenAI API Key")
 
 # Input for the OpenAI API key.
 api_key = st.sidebar.text_input("OpenAI API Key", type="password")
 
+# Batch mode: submit all tools through the OpenAI Batch API instead of one request per tool.
+batch_mode = st.sidebar.checkbox(
+    "Batch Mode",
+    help=("Send all tools as one OpenAI Batch API job. It costs about 50% less and avoids rate limits, "
+          "but results may take minutes (up to 24h). Rerunning with the same file and tool IDs resumes the batch.")
+)
+
+# Number of tools packed into a single OpenAI request (1 = one streamed request per tool).
+tools_per_request = st.sidebar.number_input(
+    "Tools per Request",
+    min_value=1,
+    max_value=10,
+    value=1,
+    help=("Group several tools into one request to save round-trips when you hit the requests-per-minute limit. "
+          "With 1, each tool's code is streamed as it is generated.")
+)
+
 
 st.sidebar.markdown("---")
 st.sidebar.header("Helpers")
@@ -92,17 +174,11 @@ if st.sidebar.button("Generate Sequence"):
     if not uploaded_file:
         st.sidebar.warning("Please upload a .yxmd file before generating the execution sequence.")
     else:
-        # Save the uploaded file to a temporary path
-        temp_file_path = "uploaded_workflow.yxmd"
-        with open(temp_file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        logging.debug(f"File saved to {temp_file_path} for generating execution sequence.")
-
         # Load Alteryx data
-        df_nodes, df_connections = parser.load_alteryx_data(temp_file_path)
+        df_nodes, df_connections = _load_workflow()
 
         # Generate execution sequence (list of tool IDs)
-        execution_sequence = traverse_helper.get_execution_order(df_nodes, df_connections)
+        execution_sequence = _get_execution_order(df_nodes, df_connections)
         st.session_state.sequence_str = ", ".join(str(tid) for tid in execution_sequence)
 
         # Mark sequence as generated in session state
@@ -133,19 +209,11 @@ if st.sidebar.button("Fetch Child Tool IDs"):
     if not uploaded_file:
         st.sidebar.warning("Please upload a .yxmd file before fetching child IDs.")
     else:
-        # Save the uploaded file to a temporary path.
-        temp_file_path = "uploaded_workflow.yxmd"
-        with open(temp_file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        logging.debug(f"File saved to {temp_file_path} for container child ID lookup.")
-
-        # Load Alteryx data
-        df_nodes, df_connections = parser.load_alteryx_data(temp_file_path)
-
         # If the user provided a container tool ID
         if container_tool_id:
-            df_containers = parser.extract_container_children(df_nodes)
-            df_containers = parser.clean_container_children(df_containers, df_nodes)
+            # Wait for the background parse first, so the cached loader below doesn't parse the file again.
+            _load_workflow()
+            df_containers = _load_container_children(file_bytes)
 
             # Find the specific container
             container_info = df_containers[df_containers["container_id"] == container_tool_id]
@@ -180,7 +248,8 @@ tool_ids_input = st.text_input(
     placeholder="e.g., 644, 645, 646",
     help=("Enter one or more tool IDs separated by commas. For example: '644, 645, 646'. "
           "It's recommended to group tools that are logically connected together. "
-          "Note: Each tool takes about 4 seconds to generate, so parsing 10 tools may take around 40 seconds.")
+          "Note: Each tool takes about 4 seconds to generate; up to 8 tools are generated at the same time, "
+          "so parsing 10 tools may take around 8 seconds.")
 )
 
 extra_user_instructions = st.text_input(
@@ -189,24 +258,26 @@ extra_user_instructions = st.text_input(
     help="You can provide additional instructions for the code generation."
 )
 
+# Clean up tool IDs input: remove double quotes/brackets and split by comma.
+tool_ids_clean = tool_ids_input.translate(_CLEAN_TBL)
+tool_ids = [tid.strip() for tid in tool_ids_clean.split(",") if tid.strip()]
+
+# Everything the conversion result depends on; an unchanged key means the stored result is still valid.
+conversion_key = hash((file_key, tuple(tool_ids), extra_user_instructions, batch_mode, tools_per_request))
+
 # Button to run the conversion
 if st.button("Run Conversion"):
     # Basic input validation
     if not uploaded_file or not api_key or not tool_ids_input:
         st.error("Please upload a .yxmd file, provide an API key, and enter tool IDs.")
         logging.error("Missing one or more required inputs.")
+    elif st.session_state.get("conversion_key") == conversion_key and "final_script" in st.session_state:
+        st.info("Inputs haven't changed since the last conversion, showing its result below.")
     else:
-        # Save the uploaded file to a temporary path.
-        temp_file_path = "uploaded_workflow.yxmd"
-        with open(temp_file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        logging.debug(f"File saved to {temp_file_path} for conversion.")
-
-        # Clean up tool IDs input: remove double quotes/brackets and split by comma.
-        tool_ids_clean = tool_ids_input.replace('"', '').replace("'", '').replace("[", '').replace("]", '')
-        tool_ids = [tid.strip() for tid in tool_ids_clean.split(",") if tid.strip()]
-        logging.debug(f"Parsed tool IDs: {tool_ids}")
-
+        logging.debug("Parsed tool IDs: %s", tool_ids)
+        # Drop the previous result, it no longer matches the inputs.
+        for key in ("final_script", "prompt", "conversion_key"):
+            st.session_state.pop(key, None)
 
         # Set the OpenAI API key as an environment variable.
         os.environ["OPENAI_API_KEY"] = api_key
@@ -220,33 +291,88 @@ if st.button("Run Conversion"):
 
             # Load Alteryx nodes and connections from the selected file.
             message_placeholder.write("Parse alteryx file...")
-            df_nodes, df_connections = parser.load_alteryx_data(temp_file_path)
+            df_nodes, df_connections = _load_workflow()
             st.write(f"Loaded {len(df_nodes)} nodes and {len(df_connections)} connections.")
             progress_bar.progress(5)
 
 
-            # Filter out unwanted tool types.
-            df_nodes = df_nodes[~df_nodes["tool_type"].isin(["BrowseV2", "Toolcontainer"])]
+            # Filter out unwanted tool types, once per uploaded file.
+            if st.session_state.get("nodes_key") != file_key:
+                # Index by tool_id (keeping the column) so selecting tools is a hash lookup.
+                st.session_state.nodes_filtered = (
+                    df_nodes[~df_nodes["tool_type"].isin(SKIPPED_TOOL_TYPES)].set_index("tool_id", drop=False)
+                )
+                st.session_state.nodes_key = file_key
+            df_nodes = st.session_state.nodes_filtered
             message_placeholder.write(f"After filtering, {len(df_nodes)} nodes remain.")
             st.write(f"After filtering browser and container, {len(df_nodes)} nodes remain.")
 
-            # Generate Python code for the specified tool IDs.
-            test_df = df_nodes.loc[df_nodes["tool_id"].isin(tool_ids)]
-            message_placeholder.write(f"**Generating code for {len(test_df)} tool(s), it may take {len(test_df)*4} seconds...**")
-            logging.debug(f"Generating code for {len(test_df)} tool(s) with tool IDs: {tool_ids}")
+            # Drop tool IDs that aren't in the (filtered) workflow before spending any API calls on them.
+            known_tool_ids = set(df_nodes.index.astype(str))
+            unknown_tool_ids = [tid for tid in tool_ids if tid not in known_tool_ids]
+            if unknown_tool_ids:
+                st.warning(f"Unknown tool IDs ignored (not in the workflow, or a browse/container tool): {', '.join(unknown_tool_ids)}")
+                tool_ids = [tid for tid in tool_ids if tid in known_tool_ids]
+            if not tool_ids:
+                message_placeholder.write("**None of the given tool IDs can be converted.**")
+                logging.error("No known tool IDs to convert.")
+                st.stop()
 
-            # Generate execution sequence.
-            execution_sequence = traverse_helper.get_execution_order(df_nodes, df_connections)
-            logging.debug(f"Execution sequence generated with {len(execution_sequence)} steps.")
+            # Generate Python code for the specified tool IDs.
+            test_df = df_nodes.loc[df_nodes.index.intersection(tool_ids)]
+            estimated_seconds = -(-len(test_df) // prompt_helper.MAX_CONCURRENT_REQUESTS) * 4
+            message_placeholder.write(f"**Generating code for {len(test_df)} tool(s), it may take {estimated_seconds} seconds...**")
+            logging.debug("Generating code for %d tool(s) with tool IDs: %s", len(test_df), tool_ids)
+
+            if batch_mode:
+                # Resume the pending batch of the same file and tools (e.g. after a page rerun) instead of resubmitting.
+                batch_key = (file_key, tuple(tool_ids))
+                if st.session_state.get("batch_key") != batch_key or "batch_id" not in st.session_state:
+                    message_placeholder.write(f"**Submitting a batch job for {len(test_df)} tool(s)...**")
+                    st.session_state.batch_id = prompt_helper.submit_batch(test_df, df_connections)
+                    st.session_state.batch_key = batch_key
+                    logging.debug("Submitted batch %s.", st.session_state.batch_id)
+                else:
+                    logging.debug("Resuming batch %s.", st.session_state.batch_id)
+
+                try:
+                    df_generated_code = prompt_helper.retrieve_batch_results(
+                        st.session_state.batch_id, test_df, df_connections, progress_bar, message_placeholder
+                    )
+                except Exception:
+                    # A failed batch can't be resumed, the next run submits a new one.
+                    st.session_state.pop("batch_id", None)
+                    raise
+                st.session_state.pop("batch_id", None)
+
+                # Generate execution sequence.
+                execution_sequence = _get_execution_order(df_nodes, df_connections)
+            else:
+                # Generate the code of all tools concurrently, and the execution sequence alongside it.
+                # Code of unchanged tools is reused from previous runs of this session.
+                gen_cache = st.session_state.setdefault("gen_cache", {})
+                if tools_per_request > 1:
+                    generate_code = prompt_helper.agenerate_python_code_batched(
+                        test_df, df_connections, batch_size=tools_per_request,
+                        progress_bar=progress_bar, message_placeholder=message_placeholder, cache=gen_cache
+                    )
+                else:
+                    # The code of each tool is streamed into this expander as it is generated.
+                    code_container = st.expander("Generated code per tool", expanded=True)
+                    generate_code = prompt_helper.agenerate_python_code_from_alteryx_df(
+                        test_df, df_connections, progress_bar, message_placeholder,
+                        cache=gen_cache, code_container=code_container
+                    )
+                df_generated_code, execution_sequence = asyncio.run(
+                    _generate_code_while_ordering(generate_code, df_nodes, df_connections)
+                )
+            logging.debug("Execution sequence generated with %d steps.", len(execution_sequence))
             message_placeholder.write(f"Execution sequence generated with {len(execution_sequence)} steps.")
 
             # Adjust the order of tool IDs based on the execution sequence.
             ordered_tool_ids = traverse_helper.adjust_order(tool_ids, execution_sequence)
             st.write(f"Tool IDs ordered has been adjusted based on execution sequence.")
 
-
-            df_generated_code = prompt_helper.generate_python_code_from_alteryx_df(test_df, df_connections, progress_bar, message_placeholder)
-
             # If "tool_id" is missing in df_generated_code, insert it
             if "tool_id" not in df_generated_code.columns:
                 logging.debug("Adding missing 'tool_id' column to generated code DataFrame.")
@@ -254,17 +380,26 @@ if st.button("Run Conversion"):
 
             message_placeholder.write("**Working on combining code snippets...**")
 
-            # Combine code snippets for the specified tools.
-            final_script, prompt = prompt_helper.combine_python_code_of_tools(tool_ids, df_generated_code, execution_sequence=ordered_tool_ids, extra_user_instructions=extra_user_instructions)
+            # Combine code snippets for the specified tools, looked up by tool id.
+            code_map = dict(zip(df_generated_code["tool_id"].astype(str), df_generated_code["python_code"]))
+            final_script, prompt = prompt_helper.combine_python_code_of_tools(code_map, execution_sequence=ordered_tool_ids, extra_user_instructions=extra_user_instructions)
             message_placeholder.write("**Finished generating code!**")
             progress_bar.progress(100)
             st.success("Conversion succeeded! Scroll down to see your Python code.")
-            st.code(final_script, language="python")
-            st.header("Following a prompt was used to generate the code:")
-            st.write("This app is using gpt-4o, if want better result. Please use following prompt in ChatGPT app with o1 or o3-mini-high model")
-            st.code(prompt, language="python")
+
+            # Keep the result so it survives reruns triggered by other widgets.
+            st.session_state.final_script = final_script
+            st.session_state.prompt = prompt
+            st.session_state.conversion_key = conversion_key
 
         except Exception as e:
             st.error("Conversion Error:")
             st.exception(e)
             logging.exception("Error during conversion process.")
+
+# Show the latest conversion result (also on reruns that didn't run the conversion).
+if "final_script" in st.session_state:
+    st.code(st.session_state.final_script, language="python")
+    st.header("Following a prompt was used to generate the code:")
+    st.write("This app is using gpt-4o, if want better result. Please use following prompt in ChatGPT app with o1 or o3-mini-high model")
+    st.code(st.session_state.prompt, language="python")